@@ -0,0 +1,61 @@
+import asyncio
+import functools
+import time
+
+
+# name -> counters, exposed through /api/admin/coalescing
+stats = {}
+
+
+def single_flight(name, key=None, ttl=0):
+    """Share one in-flight computation between concurrent identical calls.
+
+    Calls to the decorated coroutine with the same ``key(*args, **kwargs)``
+    await a single task instead of each running it. With ``ttl`` > 0 the
+    result is also reused for that many seconds after it completes.
+    Exceptions are propagated to every waiter and never cached.
+
+    Apply it to the computation behind a handler, after authentication,
+    so that callers only ever share results within their own scope.
+    """
+    counters = stats.setdefault(name, {"calls": 0, "executions": 0, "coalesced": 0, "cache_hits": 0})
+
+    def decorator(fn):
+        inflight = {}
+        cache = {}
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            k = key(*args, **kwargs) if key else None
+            counters["calls"] += 1
+
+            if ttl:
+                cached = cache.get(k)
+                if cached and cached[0] > time.monotonic():
+                    counters["cache_hits"] += 1
+                    return cached[1]
+
+            task = inflight.get(k)
+            if task:
+                counters["coalesced"] += 1
+            else:
+                counters["executions"] += 1
+                task = asyncio.ensure_future(fn(*args, **kwargs))
+                inflight[k] = task
+
+                def done(t, k=k):
+                    inflight.pop(k, None)
+                    if ttl and not t.cancelled() and t.exception() is None:
+                        now = time.monotonic()
+                        for stale in [c for c, v in cache.items() if v[0] <= now]:
+                            del cache[stale]
+                        cache[k] = (now + ttl, t.result())
+
+                task.add_done_callback(done)
+
+            # shield so one caller disconnecting doesn't cancel the others
+            return await asyncio.shield(task)
+
+        return wrapper
+
+    return decorator
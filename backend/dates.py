@@ -0,0 +1,122 @@
+"""Timestamp storage helpers.
+
+Timestamps are stored as native BSON dates. The Mongo client is tz_aware, so
+they read back as aware UTC datetimes, which FastAPI renders as ISO 8601 --
+the same shape the API returned when they were stored as strings.
+"""
+import os
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from fastapi import HTTPException
+from pymongo import UpdateOne
+from database import db
+
+BACKFILL_BATCH_SIZE = 1000
+
+# Zone of the local times old clients sent without an offset (the
+# datetime-local expiry input); used only when converting legacy strings.
+LEGACY_TIMEZONE = ZoneInfo(os.environ.get("LEGACY_TIMEZONE", "Asia/Kolkata"))
+
+# collection -> fields that used to be written as ISO strings
+DATE_FIELDS = {
+    "users": ["created_at"],
+    "food_listings": ["created_at", "updated_at", "expiry_time"],
+    "pickups": [
+        "created_at", "updated_at",
+        "timestamps.created", "timestamps.accepted", "timestamps.en_route",
+        "timestamps.collected", "timestamps.delivered"
+    ],
+    "redistribution": ["created_at"],
+    "audit_logs": ["timestamp"],
+    "tombstones": ["deleted_at", "created_at"],
+}
+
+
+def parse_datetime(value, naive_tz=timezone.utc):
+    """An aware UTC datetime from a datetime or ISO string; None if unreadable.
+
+    Naive values are taken to be in ``naive_tz``; pass ``naive_tz=None`` to
+    reject them (also with None) where the caller's zone is unknown.
+    """
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            return None
+    if parsed.tzinfo is None:
+        if naive_tz is None:
+            return None
+        parsed = parsed.replace(tzinfo=naive_tz)
+    return parsed.astimezone(timezone.utc)
+
+
+def _is_date_only(value):
+    try:
+        date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _range_bound(value):
+    parsed = parse_datetime(value)
+    if not parsed:
+        raise HTTPException(400, "from and to must be ISO 8601 dates or timestamps")
+    return parsed
+
+
+def date_range(start=None, end=None):
+    """A Mongo range condition for optional inclusive from/to query params.
+
+    A date-only ``end`` such as ``2024-06-30`` covers that whole day.
+    """
+    condition = {}
+    if start:
+        condition["$gte"] = _range_bound(start)
+    if end:
+        if _is_date_only(end):
+            condition["$lt"] = _range_bound(end) + timedelta(days=1)
+        else:
+            condition["$lte"] = _range_bound(end)
+    return condition
+
+
+def _get_path(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+async def backfill_native_dates():
+    """Convert timestamps still stored as ISO strings into BSON dates.
+
+    Strings without an offset are read in LEGACY_TIMEZONE. Strings that
+    can't be parsed (e.g. free-form expiry times from old clients) are left
+    untouched.
+    """
+    for collection, fields in DATE_FIELDS.items():
+        cursor = db[collection].find(
+            {"$or": [{f: {"$type": "string"}} for f in fields]},
+            {f: 1 for f in fields}
+        ).batch_size(BACKFILL_BATCH_SIZE)
+
+        ops = []
+        async for doc in cursor:
+            updates = {}
+            for field in fields:
+                value = _get_path(doc, field)
+                if isinstance(value, str):
+                    parsed = parse_datetime(value, naive_tz=LEGACY_TIMEZONE)
+                    if parsed:
+                        updates[field] = parsed
+            if updates:
+                ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": updates}))
+            if len(ops) >= BACKFILL_BATCH_SIZE:
+                await db[collection].bulk_write(ops, ordered=False)
+                ops = []
+        if ops:
+            await db[collection].bulk_write(ops, ordered=False)
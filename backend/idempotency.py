@@ -0,0 +1,150 @@
+"""Idempotency-Key support for write endpoints.
+
+The first request with a given key (per user and endpoint) runs normally and
+its response is stored in ``db.idempotency_keys`` (expired by a TTL index)
+and in a small in-process LRU. Retries with the same key get the stored
+response without touching the business collections. Concurrent duplicates
+in this process await the first request's task; duplicates arriving at
+another process poll the stored record until it completes.
+
+A pending record holds a lease (``locked_until``) that the running request
+renews every LEASE_S / 3 seconds. If the process running it dies, the lease
+runs out and a duplicate takes the record over atomically and runs the
+request itself. A live request only loses its lease if a renewal is delayed
+by more than two thirds of LEASE_S.
+"""
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+from database import db
+
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60
+CACHE_SIZE = 1000
+WAIT_TIMEOUT_S = 10
+POLL_INTERVAL_S = 0.1
+LEASE_S = 30
+
+# record id -> (expires at, fingerprint, response)
+_cache = OrderedDict()
+# record id -> (fingerprint, task)
+_inflight = {}
+
+
+def _fingerprint(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _check_fingerprint(expected, fingerprint):
+    if expected != fingerprint:
+        raise HTTPException(422, "Idempotency-Key was already used with a different request body")
+
+
+def _remember(record_id, fingerprint, response):
+    _cache[record_id] = (time.monotonic() + IDEMPOTENCY_TTL_SECONDS, fingerprint, response)
+    _cache.move_to_end(record_id)
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+async def _acquire(record_id, fingerprint, owner):
+    """Claim the record for ``owner``: create it, or take over an expired lease."""
+    now = datetime.now(timezone.utc)
+    locked_until = now + timedelta(seconds=LEASE_S)
+    try:
+        await db.idempotency_keys.insert_one({
+            "_id": record_id,
+            "fingerprint": fingerprint,
+            "status": "pending",
+            "owner": owner,
+            "locked_until": locked_until,
+            "created_at": now
+        })
+        return True
+    except DuplicateKeyError:
+        pass
+
+    taken = await db.idempotency_keys.find_one_and_update(
+        {"_id": record_id, "fingerprint": fingerprint,
+         "status": "pending", "locked_until": {"$lt": now}},
+        {"$set": {"owner": owner, "locked_until": locked_until}}
+    )
+    return taken is not None
+
+
+async def _renew_lease(record_id, owner):
+    while True:
+        await asyncio.sleep(LEASE_S / 3)
+        renewed = await db.idempotency_keys.update_one(
+            {"_id": record_id, "status": "pending", "owner": owner},
+            {"$set": {"locked_until": datetime.now(timezone.utc) + timedelta(seconds=LEASE_S)}}
+        )
+        if not renewed.matched_count:
+            return
+
+
+async def _execute(record_id, fingerprint, fn):
+    owner = uuid.uuid4().hex
+    deadline = time.monotonic() + WAIT_TIMEOUT_S
+    while not await _acquire(record_id, fingerprint, owner):
+        record = await db.idempotency_keys.find_one({"_id": record_id})
+        if record:
+            _check_fingerprint(record["fingerprint"], fingerprint)
+            if record["status"] == "completed":
+                _remember(record_id, fingerprint, record["response"])
+                return record["response"]
+        # a missing record means the original failed; the next _acquire retries it
+        if time.monotonic() >= deadline:
+            raise HTTPException(409, "A request with this Idempotency-Key is still in progress")
+        await asyncio.sleep(POLL_INTERVAL_S)
+
+    mine = {"_id": record_id, "status": "pending", "owner": owner}
+    renewal = asyncio.ensure_future(_renew_lease(record_id, owner))
+    try:
+        response = await fn()
+    except BaseException:
+        # let the client retry with the same key
+        await db.idempotency_keys.delete_one(mine)
+        raise
+    finally:
+        renewal.cancel()
+
+    await db.idempotency_keys.update_one(
+        mine, {"$set": {"status": "completed", "response": response}}
+    )
+    _remember(record_id, fingerprint, response)
+    return response
+
+
+async def idempotent(key, user, scope, payload, fn):
+    """Run ``fn()`` once per (user, scope, key) and replay its response.
+
+    Without a key ``fn`` simply runs. ``payload`` is the request body; reusing
+    a key with a different body is rejected with 422.
+    """
+    if not key:
+        return await fn()
+
+    record_id = f"{user['id']}:{scope}:{key}"
+    fingerprint = _fingerprint(payload)
+
+    cached = _cache.get(record_id)
+    if cached and cached[0] > time.monotonic():
+        _check_fingerprint(cached[1], fingerprint)
+        _cache.move_to_end(record_id)
+        return cached[2]
+
+    inflight = _inflight.get(record_id)
+    if inflight:
+        _check_fingerprint(inflight[0], fingerprint)
+        return await asyncio.shield(inflight[1])
+
+    task = asyncio.ensure_future(_execute(record_id, fingerprint, fn))
+    _inflight[record_id] = (fingerprint, task)
+    task.add_done_callback(lambda t: _inflight.pop(record_id, None))
+    return await asyncio.shield(task)
@@ -0,0 +1,165 @@
+"""Catalogue of the query shapes the routers issue and the indexes serving them.
+
+Every find/count the API runs with a filter or sort should match a shape
+here. server.lifespan creates the indexes from this list (plus TTL_INDEXES)
+and drops any other index on the catalogued collections, and
+tests/test_query_shapes.py checks with explain() that no shape falls back to
+a collection scan or an in-memory sort. Unfiltered, unsorted reads (the
+analytics roll-ups) are full scans by design and are not listed.
+"""
+import logging
+from datetime import datetime, timezone
+
+from idempotency import IDEMPOTENCY_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+ANY = "x"
+SOME = {"$in": ["x", "y"]}
+SINCE = {"$gt": datetime(2024, 1, 1, tzinfo=timezone.utc)}
+BETWEEN = {"$gte": datetime(2024, 1, 1, tzinfo=timezone.utc), "$lte": datetime(2024, 12, 31, tzinfo=timezone.utc)}
+
+
+def _after(field):
+    # the (timestamp, id) cursor built by sync.after_cursor
+    return {"$or": [
+        {field: {"$gt": datetime(2024, 1, 1, tzinfo=timezone.utc),
+                 "$lte": datetime(2024, 12, 31, tzinfo=timezone.utc)}},
+        {field: datetime(2024, 1, 1, tzinfo=timezone.utc), "id": {"$gt": ANY}}
+    ]}
+
+
+QUERY_SHAPES = [
+    # users
+    {"name": "users.by_email", "collection": "users", "filter": {"email": ANY},
+     "index": [("email", 1)], "unique": True},
+    {"name": "users.by_id", "collection": "users", "filter": {"id": ANY},
+     "index": [("id", 1)], "unique": True},
+    {"name": "users.by_role", "collection": "users", "filter": {"role": ANY},
+     "index": [("role", 1)]},
+
+    # food_listings
+    {"name": "listings.by_id", "collection": "food_listings", "filter": {"id": ANY},
+     "index": [("id", 1)], "unique": True},
+    {"name": "listings.by_ids", "collection": "food_listings", "filter": {"id": SOME},
+     "index": [("id", 1)], "unique": True},
+    {"name": "listings.recent", "collection": "food_listings", "filter": {},
+     "sort": [("created_at", -1)], "index": [("created_at", -1)]},
+    {"name": "listings.created_between", "collection": "food_listings", "filter": {"created_at": BETWEEN},
+     "sort": [("created_at", -1)], "index": [("created_at", -1)]},
+    {"name": "listings.by_status", "collection": "food_listings", "filter": {"status": ANY},
+     "sort": [("created_at", -1)], "index": [("status", 1), ("created_at", -1)]},
+    {"name": "listings.by_category", "collection": "food_listings", "filter": {"category": ANY},
+     "sort": [("created_at", -1)], "index": [("category", 1), ("created_at", -1)]},
+    {"name": "listings.by_status_category", "collection": "food_listings",
+     "filter": {"status": ANY, "category": ANY}, "sort": [("created_at", -1)],
+     "index": [("status", 1), ("category", 1), ("created_at", -1)]},
+    {"name": "listings.changed_since", "collection": "food_listings",
+     "filter": _after("updated_at"), "sort": [("updated_at", 1), ("id", 1)],
+     "index": [("updated_at", 1), ("id", 1)]},
+    {"name": "listings.by_donor", "collection": "food_listings", "filter": {"donor_id": ANY},
+     "sort": [("created_at", -1)], "index": [("donor_id", 1), ("created_at", -1)]},
+    {"name": "listings.by_donor_status", "collection": "food_listings",
+     "filter": {"donor_id": ANY, "status": ANY}, "sort": [("created_at", -1)],
+     "index": [("donor_id", 1), ("created_at", -1)]},
+
+    # pickups
+    {"name": "pickups.by_id", "collection": "pickups", "filter": {"id": ANY},
+     "index": [("id", 1)], "unique": True},
+    {"name": "pickups.by_ids", "collection": "pickups", "filter": {"id": SOME},
+     "index": [("id", 1)], "unique": True},
+    {"name": "pickups.recent", "collection": "pickups", "filter": {},
+     "sort": [("created_at", -1)], "index": [("created_at", -1)]},
+    {"name": "pickups.created_between", "collection": "pickups", "filter": {"created_at": BETWEEN},
+     "sort": [("created_at", -1)], "index": [("created_at", -1)]},
+    {"name": "pickups.by_ngo", "collection": "pickups", "filter": {"ngo_id": ANY},
+     "sort": [("created_at", -1)], "index": [("ngo_id", 1), ("created_at", -1)]},
+    {"name": "pickups.by_ngo_status", "collection": "pickups",
+     "filter": {"ngo_id": ANY, "status": SOME},
+     "index": [("ngo_id", 1), ("created_at", -1)]},
+    {"name": "pickups.by_ngo_one_status", "collection": "pickups",
+     "filter": {"ngo_id": ANY, "status": ANY}, "sort": [("created_at", -1)],
+     "index": [("ngo_id", 1), ("created_at", -1)]},
+    {"name": "pickups.by_ngo_created_between", "collection": "pickups",
+     "filter": {"ngo_id": ANY, "created_at": BETWEEN}, "sort": [("created_at", -1)],
+     "index": [("ngo_id", 1), ("created_at", -1)]},
+    {"name": "pickups.by_ngo_ids", "collection": "pickups",
+     "filter": {"id": SOME, "ngo_id": ANY},
+     "index": [("id", 1)], "unique": True},
+    {"name": "pickups.route_plan", "collection": "pickups",
+     "filter": {"ngo_id": ANY, "status": SOME, "id": SOME},
+     "index": [("id", 1)], "unique": True},
+    {"name": "pickups.by_listings", "collection": "pickups", "filter": {"listing_id": SOME},
+     "sort": [("created_at", -1)], "index": [("listing_id", 1), ("created_at", -1)]},
+    {"name": "pickups.by_listings_status", "collection": "pickups",
+     "filter": {"listing_id": SOME, "status": ANY}, "sort": [("created_at", -1)],
+     "index": [("listing_id", 1), ("created_at", -1)]},
+    {"name": "pickups.by_status", "collection": "pickups", "filter": {"status": SOME},
+     "sort": [("created_at", -1)], "index": [("status", 1), ("created_at", -1)]},
+    {"name": "pickups.changed_since", "collection": "pickups",
+     "filter": _after("updated_at"), "sort": [("updated_at", 1), ("id", 1)],
+     "index": [("updated_at", 1), ("id", 1)]},
+    {"name": "pickups.by_ngo_changed_since", "collection": "pickups",
+     "filter": {"ngo_id": ANY, **_after("updated_at")}, "sort": [("updated_at", 1), ("id", 1)],
+     "index": [("ngo_id", 1), ("updated_at", 1), ("id", 1)]},
+    {"name": "pickups.by_listings_changed_since", "collection": "pickups",
+     "filter": {"listing_id": SOME, **_after("updated_at")}, "sort": [("updated_at", 1), ("id", 1)],
+     "index": [("listing_id", 1), ("updated_at", 1), ("id", 1)]},
+
+    # redistribution
+    {"name": "redistribution.by_id", "collection": "redistribution", "filter": {"id": ANY},
+     "index": [("id", 1)], "unique": True},
+    {"name": "redistribution.by_ngo", "collection": "redistribution", "filter": {"ngo_id": ANY},
+     "index": [("ngo_id", 1)]},
+    {"name": "redistribution.created_since", "collection": "redistribution",
+     "filter": {"created_at": SINCE}, "index": [("created_at", 1)]},
+
+    # tombstones
+    {"name": "tombstones.deleted_since", "collection": "tombstones",
+     "filter": {"collection": ANY, **_after("deleted_at")}, "sort": [("deleted_at", 1), ("id", 1)],
+     "index": [("collection", 1), ("deleted_at", 1), ("id", 1)]},
+
+    # audit_logs
+    {"name": "audit_logs.recent", "collection": "audit_logs", "filter": {},
+     "sort": [("timestamp", -1)], "index": [("timestamp", -1)]},
+    {"name": "audit_logs.between", "collection": "audit_logs", "filter": {"timestamp": BETWEEN},
+     "sort": [("timestamp", -1)], "index": [("timestamp", -1)]},
+]
+
+
+# Indexes that exist to expire documents rather than to serve a query
+TTL_INDEXES = [
+    {"collection": "idempotency_keys", "index": [("created_at", 1)],
+     "expireAfterSeconds": IDEMPOTENCY_TTL_SECONDS},
+]
+
+
+def catalogue_indexes():
+    """Distinct (collection, keys, options) triples declared by QUERY_SHAPES and TTL_INDEXES."""
+    seen = {}
+    for entry in QUERY_SHAPES + TTL_INDEXES:
+        key = (entry["collection"], tuple(entry["index"]))
+        options = {k: entry[k] for k in ("unique", "expireAfterSeconds", "partialFilterExpression") if k in entry}
+        seen.setdefault(key, options)
+    return [(collection, list(keys), options) for (collection, keys), options in seen.items()]
+
+
+def _key_spec(keys):
+    # index_information() may report directions as floats (1.0)
+    return tuple((field, direction if isinstance(direction, str) else int(direction))
+                 for field, direction in keys)
+
+
+async def ensure_indexes(db):
+    """Create the catalogued indexes, then drop any others on those collections."""
+    declared = {}
+    for collection, keys, options in catalogue_indexes():
+        await db[collection].create_index(keys, **options)
+        declared.setdefault(collection, set()).add(_key_spec(keys))
+
+    for collection, specs in declared.items():
+        existing = await db[collection].index_information()
+        for name, info in existing.items():
+            if name != "_id_" and _key_spec(info["key"]) not in specs:
+                logger.info("Dropping index %s.%s, not in the catalogue", collection, name)
+                await db[collection].drop_index(name)
@@ -0,0 +1,25 @@
+"""One-off data migrations run at startup.
+
+Each migration is recorded in ``db.migrations`` once it finishes, so later
+startups skip it instead of scanning the collections again. Migrations must
+be safe to re-run: two workers starting together may both run one before
+either records it, and a migration interrupted midway runs again in full.
+"""
+import logging
+from datetime import datetime, timezone
+from database import db
+
+logger = logging.getLogger(__name__)
+
+
+async def run_once(name, fn):
+    if await db.migrations.find_one({"_id": name}):
+        return False
+    logger.info("Running migration %s", name)
+    await fn()
+    await db.migrations.update_one(
+        {"_id": name},
+        {"$setOnInsert": {"completed_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+    return True
@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+from pathlib import Path
+
+from fastapi import HTTPException
+from pyinstrument import Profiler
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Request profiling is enabled by setting PROFILE_DIR. A request is profiled
+# when an admin sends "X-Profile: 1" or when it is picked by the sample rate.
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+
+# Mongo commands slower than this are logged with an explain() summary.
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "0"))
+# explain() re-runs the query, so each query shape is explained at most this often.
+SLOW_QUERY_EXPLAIN_INTERVAL_S = float(os.environ.get("SLOW_QUERY_EXPLAIN_INTERVAL_S", "300"))
+
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct"}
+WRITE_COMMANDS = {"update": "updates", "delete": "deletes", "findAndModify": None}
+
+
+async def _is_admin_request(request):
+    # checks the stored role, not the token's claim, so a demoted admin
+    # loses profiling rights before their token expires
+    from routes.auth import require_admin
+
+    try:
+        await require_admin(request.headers.get("authorization"))
+    except HTTPException:
+        return False
+    return True
+
+
+async def _should_profile(request):
+    if request.headers.get("x-profile") == "1" and await _is_admin_request(request):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _write_profile(profiler, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(profiler.output_html())
+
+
+# pyinstrument allows one active profiler per thread, so only one request
+# is profiled at a time; others selected meanwhile run unprofiled.
+_profiling_active = False
+
+
+async def profile_requests(request, call_next):
+    """HTTP middleware writing a pyinstrument profile of selected requests
+    to PROFILE_DIR. Only registered when PROFILE_DIR is set.
+    """
+    global _profiling_active
+    selected = not _profiling_active and await _should_profile(request)
+    # re-checked: another request may have started profiling during the role lookup
+    if not selected or _profiling_active:
+        return await call_next(request)
+
+    _profiling_active = True
+    profiler = Profiler(async_mode="enabled")
+    profiler.start()
+    started = time.perf_counter()
+    try:
+        return await call_next(request)
+    finally:
+        profiler.stop()
+        _profiling_active = False
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        name = "{}.{:03d}_{}_{}_{}".format(
+            time.strftime("%Y%m%dT%H%M%S"),
+            int(time.time() * 1000) % 1000,
+            request.method,
+            request.url.path.strip("/").replace("/", "_") or "root",
+            uuid.uuid4().hex[:8]
+        )
+        path = Path(PROFILE_DIR) / f"{name}.html"
+        # rendering a large profile takes a while; keep it off the event loop
+        await asyncio.to_thread(_write_profile, profiler, path)
+        logger.info("Profiled %s %s (%.1f ms) -> %s", request.method, request.url.path, elapsed_ms, path)
+
+
+def summarize_explain(explain):
+    """Reduce explain() output to the plan stages and examined counts."""
+    if "stages" in explain and "queryPlanner" not in explain:
+        # aggregate: the query part lives in the first ($cursor) stage
+        explain = explain["stages"][0].get("$cursor", {})
+
+    stages = []
+
+    def walk(plan):
+        plan = plan.get("queryPlan", plan)
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        children = list(plan.get("inputStages", []))
+        if "inputStage" in plan:
+            children.append(plan["inputStage"])
+        for child in children:
+            walk(child)
+
+    walk(explain.get("queryPlanner", {}).get("winningPlan", {}))
+    execution = explain.get("executionStats", {})
+    return {
+        "stages": stages,
+        "collscan": "COLLSCAN" in stages,
+        "in_memory_sort": "SORT" in stages,
+        "docs_examined": execution.get("totalDocsExamined"),
+        "keys_examined": execution.get("totalKeysExamined"),
+        "returned": execution.get("nReturned"),
+    }
+
+
+async def _explain_and_log(database_name, command_name, command, duration_ms):
+    from database import client
+
+    collection = command.get(command_name)
+    explain_cmd = {k: v for k, v in command.items() if not k.startswith("$") and k not in ("lsid", "txnNumber")}
+    try:
+        explain = await client[database_name].command(
+            {"explain": explain_cmd, "verbosity": "executionStats"}
+        )
+        summary = summarize_explain(explain)
+    except Exception as e:
+        summary = {"error": str(e)}
+    logger.warning(
+        "Slow %s on %s (%.1f ms) filter=%s sort=%s pipeline=%s plan=%s",
+        command_name, collection, duration_ms,
+        command.get("filter", command.get("query")), command.get("sort"),
+        command.get("pipeline"), summary
+    )
+
+
+def _query_shape(value):
+    """``value`` with literals blanked, so queries differing only in values match."""
+    if isinstance(value, dict):
+        return {k: _query_shape(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_query_shape(v) for v in value[:1]]
+    return 1
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """Logs Mongo commands slower than SLOW_QUERY_MS.
+
+    Listener callbacks run on pymongo's worker threads, so explain() is
+    scheduled back onto the event loop captured by attach_loop().
+    """
+
+    def __init__(self, threshold_ms):
+        self.threshold_us = threshold_ms * 1000
+        self.loop = None
+        self._pending = {}
+        self._last_explained = {}
+
+    def started(self, event):
+        if event.command_name in EXPLAINABLE_COMMANDS or event.command_name in WRITE_COMMANDS:
+            self._pending[(event.connection_id, event.request_id)] = (
+                event.database_name, dict(event.command)
+            )
+
+    def succeeded(self, event):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if not pending or event.duration_micros < self.threshold_us:
+            return
+        database_name, command = pending
+        duration_ms = event.duration_micros / 1000
+
+        if event.command_name in EXPLAINABLE_COMMANDS:
+            if self.loop and self._should_explain(database_name, event.command_name, command):
+                self.loop.call_soon_threadsafe(
+                    asyncio.ensure_future,
+                    _explain_and_log(database_name, event.command_name, command, duration_ms)
+                )
+            else:
+                logger.warning(
+                    "Slow %s on %s (%.1f ms) filter=%s sort=%s pipeline=%s",
+                    event.command_name, command.get(event.command_name), duration_ms,
+                    command.get("filter", command.get("query")), command.get("sort"),
+                    command.get("pipeline")
+                )
+            return
+
+        field = WRITE_COMMANDS.get(event.command_name)
+        filters = [op.get("q") for op in command.get(field, [])] if field else command.get("query")
+        logger.warning(
+            "Slow %s on %s (%.1f ms) filter=%s",
+            event.command_name, command.get(event.command_name), duration_ms, filters
+        )
+
+    def _should_explain(self, database_name, command_name, command):
+        shape = repr((
+            database_name, command_name, command.get(command_name),
+            _query_shape(command.get("filter", command.get("query"))),
+            _query_shape(command.get("sort")), _query_shape(command.get("pipeline"))
+        ))
+        now = time.monotonic()
+        if now - self._last_explained.get(shape, float("-inf")) < SLOW_QUERY_EXPLAIN_INTERVAL_S:
+            return False
+        self._last_explained[shape] = now
+        return True
+
+    def failed(self, event):
+        self._pending.pop((event.connection_id, event.request_id), None)
+
+
+slow_query_listener = SlowQueryListener(SLOW_QUERY_MS) if SLOW_QUERY_MS > 0 else None
+
+
+def command_listeners():
+    return [slow_query_listener] if slow_query_listener else []
+
+
+def attach_loop(loop):
+    if slow_query_listener:
+        slow_query_listener.loop = loop
@@ -2,6 +2,8 @@ from fastapi import APIRouter, Header, Query
 from typing import Optional
 from database import db
 from routes.auth import require_admin
+from coalesce import single_flight, stats as coalescing_stats
+from dates import date_range
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -22,11 +24,16 @@ async def get_all_users(
 @router.get("/audit-logs")
 async def get_audit_logs(
     limit: int = Query(100),
+    from_: Optional[str] = Query(None, alias="from"),
+    to: Optional[str] = Query(None),
     authorization: str = Header(None)
 ):
     await require_admin(authorization)
+    query = {}
+    if from_ or to:
+        query["timestamp"] = date_range(from_, to)
     logs = await db.audit_logs.find(
-        {}, {"_id": 0}
+        query, {"_id": 0}
     ).sort("timestamp", -1).to_list(limit)
     return logs
 
@@ -34,7 +41,11 @@ async def get_audit_logs(
 @router.get("/stats")
 async def get_admin_stats(authorization: str = Header(None)):
     await require_admin(authorization)
+    return await _compute_admin_stats()
+
 
+@single_flight("admin.stats", ttl=5)
+async def _compute_admin_stats():
     total_users = await db.users.count_documents({})
     total_donors = await db.users.count_documents({"role": "donor"})
     total_ngos = await db.users.count_documents({"role": "ngo"})
@@ -48,3 +59,9 @@ async def get_admin_stats(authorization: str = Header(None)):
         "total_listings": total_listings,
         "total_pickups": total_pickups
     }
+
+
+@router.get("/coalescing")
+async def get_coalescing_stats(authorization: str = Header(None)):
+    await require_admin(authorization)
+    return coalescing_stats
@@ -2,19 +2,36 @@ from fastapi import APIRouter, Header
 from datetime import datetime, timezone, timedelta
 from database import db
 from routes.auth import get_current_user
+from coalesce import single_flight
 
 router = APIRouter(prefix="/api/analytics", tags=["analytics"])
 
+# impact conversion factors, shared with the reports
+MEALS_PER_KG = 2
+CO2_PER_KG = 2.5
+
+
+def _dashboard_scope(user):
+    # donor and ngo dashboards are per user; everyone else sees the platform view
+    if user["role"] in ("donor", "ngo"):
+        return user["id"]
+    return "platform"
+
 
 @router.get("/dashboard")
 async def get_dashboard(authorization: str = Header(None)):
     user = await get_current_user(authorization)
+    return await _compute_dashboard(user)
+
+
+@single_flight("analytics.dashboard", key=_dashboard_scope, ttl=5)
+async def _compute_dashboard(user):
     role = user["role"]
 
     if role == "donor":
         listings = await db.food_listings.find(
             {"donor_id": user["id"]}, {"_id": 0}
-        ).to_list(1000)
+        ).sort("created_at", -1).to_list(1000)
         total_qty = sum(l.get("quantity", 0) for l in listings)
         pickups = await db.pickups.find(
             {"listing_id": {"$in": [l["id"] for l in listings]}}, {"_id": 0}
@@ -25,18 +42,18 @@ async def get_dashboard(authorization: str = Header(None)):
             "kpis": {
                 "total_donated_kg": round(total_qty, 1),
                 "completed_pickups": len(completed),
-                "meals_served": int(total_qty * 2),
-                "co2_avoided_kg": round(total_qty * 2.5, 1),
+                "meals_served": int(total_qty * MEALS_PER_KG),
+                "co2_avoided_kg": round(total_qty * CO2_PER_KG, 1),
                 "active_listings": len([l for l in listings if l["status"] == "available"]),
                 "total_listings": len(listings)
             },
-            "recent_listings": sorted(listings, key=lambda x: x.get("created_at", ""), reverse=True)[:10]
+            "recent_listings": listings[:10]
         }
 
     elif role == "ngo":
         pickups = await db.pickups.find(
             {"ngo_id": user["id"]}, {"_id": 0}
-        ).to_list(1000)
+        ).sort("created_at", -1).to_list(1000)
         completed = [p for p in pickups if p["status"] == "delivered"]
         pending = [p for p in pickups if p["status"] in ["pending", "accepted", "en_route"]]
 
@@ -53,10 +70,10 @@ async def get_dashboard(authorization: str = Header(None)):
                 "pending_pickups": len(pending),
                 "beneficiaries_served": total_beneficiaries,
                 "total_collected_kg": round(total_qty, 1),
-                "meals_served": int(total_qty * 2),
-                "co2_avoided_kg": round(total_qty * 2.5, 1)
+                "meals_served": int(total_qty * MEALS_PER_KG),
+                "co2_avoided_kg": round(total_qty * CO2_PER_KG, 1)
             },
-            "recent_pickups": sorted(pickups, key=lambda x: x.get("created_at", ""), reverse=True)[:10]
+            "recent_pickups": pickups[:10]
         }
 
     else:
@@ -85,8 +102,8 @@ async def get_dashboard(authorization: str = Header(None)):
                 "available_listings": available,
                 "completed_pickups": completed_pickups,
                 "pending_pickups": pending_pickups,
-                "total_co2_saved_kg": round(total_qty * 2.5, 1),
-                "meals_served": int(total_qty * 2),
+                "total_co2_saved_kg": round(total_qty * CO2_PER_KG, 1),
+                "meals_served": int(total_qty * MEALS_PER_KG),
                 "beneficiaries_served": total_beneficiaries
             }
         }
@@ -94,22 +111,27 @@ async def get_dashboard(authorization: str = Header(None)):
 
 @router.get("/charts")
 async def get_chart_data(authorization: str = Header(None)):
-    user = await get_current_user(authorization)
+    await get_current_user(authorization)
+    return await _compute_chart_data()
+
 
+@single_flight("analytics.charts", ttl=5)
+async def _compute_chart_data():
     all_listings = await db.food_listings.find({}, {"_id": 0}).to_list(5000)
 
     # Donations over time (last 30 days)
     now = datetime.now(timezone.utc)
+    start = (now - timedelta(days=30)).replace(hour=0, minute=0, second=0, microsecond=0)
+    daily = {}
+    for l in all_listings:
+        created = l.get("created_at")
+        if isinstance(created, datetime) and created >= start:
+            day_str = created.strftime("%Y-%m-%d")
+            daily[day_str] = daily.get(day_str, 0) + l.get("quantity", 0)
     donations_over_time = []
     for i in range(30, -1, -1):
-        day = now - timedelta(days=i)
-        day_str = day.strftime("%Y-%m-%d")
-        day_qty = sum(
-            l.get("quantity", 0)
-            for l in all_listings
-            if l.get("created_at", "").startswith(day_str)
-        )
-        donations_over_time.append({"date": day_str, "quantity": round(day_qty, 1)})
+        day_str = (now - timedelta(days=i)).strftime("%Y-%m-%d")
+        donations_over_time.append({"date": day_str, "quantity": round(daily.get(day_str, 0), 1)})
 
     # Category distribution
     categories = {}
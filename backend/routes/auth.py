@@ -81,7 +81,7 @@ async def register(req: RegisterRequest):
         "org_name": req.org_name,
         "service_area": req.service_area,
         "phone": req.phone,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": datetime.now(timezone.utc)
     }
     await db.users.insert_one(user)
 
@@ -93,7 +93,7 @@ async def register(req: RegisterRequest):
         "user_email": user["email"],
         "action": "register",
         "details": f"New {req.role} registered: {req.org_name}",
-        "timestamp": datetime.now(timezone.utc).isoformat()
+        "timestamp": datetime.now(timezone.utc)
     })
 
     return {
@@ -126,7 +126,7 @@ async def login(req: LoginRequest):
         "user_email": user["email"],
         "action": "login",
         "details": f"{user['role']} logged in",
-        "timestamp": datetime.now(timezone.utc).isoformat()
+        "timestamp": datetime.now(timezone.utc)
     })
 
     return {
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Header
 from database import db
 from routes.auth import get_current_user
+from coalesce import single_flight
 
 router = APIRouter(prefix="/api/evaluation", tags=["evaluation"])
 
@@ -74,8 +75,12 @@ def compute_scores(total_food_kg, total_donors, total_ngos, total_pickups, compl
 
 @router.get("")
 async def get_evaluation(authorization: str = Header(None)):
-    user = await get_current_user(authorization)
+    await get_current_user(authorization)
+    return await _compute_evaluation()
 
+
+@single_flight("evaluation", ttl=5)
+async def _compute_evaluation():
     all_listings = await db.food_listings.find({}, {"_id": 0, "quantity": 1}).to_list(5000)
     total_food_kg = sum(l.get("quantity", 0) for l in all_listings)
     total_donors = await db.users.count_documents({"role": "donor"})
@@ -5,6 +5,9 @@ from typing import Optional
 import uuid
 from database import db
 from routes.auth import get_current_user
+from sync import changes_since, record_tombstone
+from dates import date_range, parse_datetime
+from idempotency import idempotent
 
 router = APIRouter(prefix="/api/listings", tags=["listings"])
 
@@ -41,9 +44,16 @@ async def get_listings(
     status: Optional[str] = Query(None),
     donor_id: Optional[str] = Query(None),
     category: Optional[str] = Query(None),
+    since: Optional[str] = Query(None),
+    from_: Optional[str] = Query(None, alias="from"),
+    to: Optional[str] = Query(None),
     authorization: str = Header(None)
 ):
     await get_current_user(authorization)
+    if since:
+        # delta reads ignore the value filters; the client applies them
+        return await changes_since("food_listings", {}, since)
+
     query = {}
     if status:
         query["status"] = status
@@ -51,20 +61,37 @@ async def get_listings(
         query["donor_id"] = donor_id
     if category:
         query["category"] = category
+    if from_ or to:
+        query["created_at"] = date_range(from_, to)
 
     listings = await db.food_listings.find(query, {"_id": 0}).sort("created_at", -1).to_list(500)
     return listings
 
 
 @router.post("")
-async def create_listing(req: CreateListingRequest, authorization: str = Header(None)):
+async def create_listing(
+    req: CreateListingRequest,
+    authorization: str = Header(None),
+    idempotency_key: Optional[str] = Header(None)
+):
     user = await get_current_user(authorization)
+    return await idempotent(
+        idempotency_key, user, "create_listing", req.model_dump(),
+        lambda: _create_listing(req, user)
+    )
+
+
+async def _create_listing(req: CreateListingRequest, user: dict):
     if user["role"] not in ["donor", "admin"]:
         raise HTTPException(403, "Only donors can create listings")
 
     if req.quantity <= 0:
         raise HTTPException(400, "Quantity must be greater than 0")
+    expiry_time = parse_datetime(req.expiry_time, naive_tz=None)
+    if not expiry_time:
+        raise HTTPException(400, "expiry_time must be an ISO 8601 timestamp with a UTC offset")
 
+    now = datetime.now(timezone.utc)
     listing = {
         "id": str(uuid.uuid4()),
         "donor_id": user["id"],
@@ -73,14 +100,14 @@ async def create_listing(req: CreateListingRequest, authorization: str = Header(
         "category": req.category,
         "quantity": req.quantity,
         "preparation_time": req.preparation_time,
-        "expiry_time": req.expiry_time,
+        "expiry_time": expiry_time,
         "storage_condition": req.storage_condition,
         "pickup_address": req.pickup_address,
         "location": {"lat": req.latitude, "lng": req.longitude},
         "urgent_flag": req.urgent_flag,
         "status": req.status,
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "updated_at": datetime.now(timezone.utc).isoformat()
+        "created_at": now,
+        "updated_at": now
     }
     await db.food_listings.insert_one(listing)
 
@@ -90,7 +117,7 @@ async def create_listing(req: CreateListingRequest, authorization: str = Header(
         "user_email": user["email"],
         "action": "create_listing",
         "details": f"Created listing: {req.food_name} ({req.quantity}kg)",
-        "timestamp": datetime.now(timezone.utc).isoformat()
+        "timestamp": datetime.now(timezone.utc)
     })
 
     result = await db.food_listings.find_one({"id": listing["id"]}, {"_id": 0})
@@ -116,6 +143,10 @@ async def update_listing(listing_id: str, req: UpdateListingRequest, authorizati
         raise HTTPException(403, "Not authorized")
 
     updates = {k: v for k, v in req.model_dump().items() if v is not None}
+    if "expiry_time" in updates:
+        updates["expiry_time"] = parse_datetime(updates["expiry_time"], naive_tz=None)
+        if not updates["expiry_time"]:
+            raise HTTPException(400, "expiry_time must be an ISO 8601 timestamp with a UTC offset")
     if "latitude" in updates or "longitude" in updates:
         loc = listing.get("location", {})
         if "latitude" in updates:
@@ -124,7 +155,7 @@ async def update_listing(listing_id: str, req: UpdateListingRequest, authorizati
             loc["lng"] = updates.pop("longitude")
         updates["location"] = loc
 
-    updates["updated_at"] = datetime.now(timezone.utc).isoformat()
+    updates["updated_at"] = datetime.now(timezone.utc)
     await db.food_listings.update_one({"id": listing_id}, {"$set": updates})
 
     result = await db.food_listings.find_one({"id": listing_id}, {"_id": 0})
@@ -141,4 +172,7 @@ async def delete_listing(listing_id: str, authorization: str = Header(None)):
         raise HTTPException(403, "Not authorized")
 
     await db.food_listings.delete_one({"id": listing_id})
+    await record_tombstone(
+        "food_listings", listing_id, datetime.now(timezone.utc), listing.get("created_at")
+    )
     return {"message": "Listing deleted"}
@@ -1,13 +1,37 @@
 from fastapi import APIRouter, HTTPException, Header, Query
 from pydantic import BaseModel
-from datetime import datetime, timezone
-from typing import Optional
+from datetime import datetime, timezone, timedelta
+from typing import List, Optional
+import asyncio
 import uuid
+from pymongo import UpdateOne
 from database import db
 from routes.auth import get_current_user
+from sync import changes_since
+from dates import LEGACY_TIMEZONE, date_range, parse_datetime
+from idempotency import idempotent
+from routing import plan_route
 
 router = APIRouter(prefix="/api/pickups", tags=["pickups"])
 
+VALID_TRANSITIONS = {
+    "pending": ["accepted"],
+    "accepted": ["en_route"],
+    "en_route": ["collected"],
+    "collected": ["delivered"]
+}
+
+# Listing status that follows a pickup reaching the given status
+LISTING_STATUS_FOR_PICKUP = {
+    "collected": "picked_up",
+    "delivered": "delivered"
+}
+
+MAX_BULK_TRANSITIONS = 200
+MAX_ROUTE_STOPS = 300
+# 2-opt search time per route, spent on a worker thread
+ROUTE_TIME_BUDGET_S = 0.5
+
 
 class CreatePickupRequest(BaseModel):
     listing_id: str
@@ -19,6 +43,25 @@ class UpdatePickupStatusRequest(BaseModel):
     notes: str = ""
 
 
+class PickupTransition(BaseModel):
+    pickup_id: str
+    status: str
+    notes: str = ""
+
+
+class BulkUpdatePickupStatusRequest(BaseModel):
+    transitions: List[PickupTransition]
+
+
+class RoutePlanRequest(BaseModel):
+    depot_lat: float
+    depot_lng: float
+    pickup_ids: List[str] = []
+    ngo_id: Optional[str] = None
+    avg_speed_kmh: float = 25.0
+    service_minutes: float = 10.0
+
+
 class RedistributionRequest(BaseModel):
     beneficiaries_count: int
     portion_size: float = 0.5
@@ -30,6 +73,9 @@ async def get_pickups(
     ngo_id: Optional[str] = Query(None),
     listing_id: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
+    since: Optional[str] = Query(None),
+    from_: Optional[str] = Query(None, alias="from"),
+    to: Optional[str] = Query(None),
     authorization: str = Header(None)
 ):
     user = await get_current_user(authorization)
@@ -44,20 +90,37 @@ async def get_pickups(
         listing_ids = [l["id"] for l in donor_listings]
         query["listing_id"] = {"$in": listing_ids}
 
+    if since:
+        # only the role scope applies; the client applies value filters
+        return await changes_since("pickups", query, since)
+
     if ngo_id:
         query["ngo_id"] = ngo_id
     if listing_id:
         query["listing_id"] = listing_id
     if status:
         query["status"] = status
+    if from_ or to:
+        query["created_at"] = date_range(from_, to)
 
     pickups = await db.pickups.find(query, {"_id": 0}).sort("created_at", -1).to_list(500)
     return pickups
 
 
 @router.post("")
-async def create_pickup(req: CreatePickupRequest, authorization: str = Header(None)):
+async def create_pickup(
+    req: CreatePickupRequest,
+    authorization: str = Header(None),
+    idempotency_key: Optional[str] = Header(None)
+):
     user = await get_current_user(authorization)
+    return await idempotent(
+        idempotency_key, user, "create_pickup", req.model_dump(),
+        lambda: _create_pickup(req, user)
+    )
+
+
+async def _create_pickup(req: CreatePickupRequest, user: dict):
     if user["role"] not in ["ngo", "admin"]:
         raise HTTPException(403, "Only NGOs can create pickups")
 
@@ -67,7 +130,7 @@ async def create_pickup(req: CreatePickupRequest, authorization: str = Header(No
     if listing["status"] != "available":
         raise HTTPException(400, "Listing is not available")
 
-    now = datetime.now(timezone.utc).isoformat()
+    now = datetime.now(timezone.utc)
     pickup = {
         "id": str(uuid.uuid4()),
         "listing_id": req.listing_id,
@@ -86,10 +149,14 @@ async def create_pickup(req: CreatePickupRequest, authorization: str = Header(No
             "collected": None,
             "delivered": None
         },
-        "created_at": now
+        "created_at": now,
+        "updated_at": now
     }
     await db.pickups.insert_one(pickup)
-    await db.food_listings.update_one({"id": req.listing_id}, {"$set": {"status": "reserved"}})
+    await db.food_listings.update_one(
+        {"id": req.listing_id},
+        {"$set": {"status": "reserved", "updated_at": now}}
+    )
 
     await db.audit_logs.insert_one({
         "id": str(uuid.uuid4()),
@@ -115,39 +182,28 @@ async def update_pickup_status(
     if not pickup:
         raise HTTPException(404, "Pickup not found")
 
-    valid_transitions = {
-        "pending": ["accepted"],
-        "accepted": ["en_route"],
-        "en_route": ["collected"],
-        "collected": ["delivered"]
-    }
-
     current = pickup["status"]
-    if req.status not in valid_transitions.get(current, []):
+    if req.status not in VALID_TRANSITIONS.get(current, []):
         raise HTTPException(400, f"Cannot transition from {current} to {req.status}")
 
-    now = datetime.now(timezone.utc).isoformat()
+    now = datetime.now(timezone.utc)
     timestamps = pickup.get("timestamps", {})
     timestamps[req.status] = now
 
     updates = {
         "status": req.status,
         "timestamps": timestamps,
+        "updated_at": now,
     }
     if req.notes:
         updates["notes"] = req.notes
 
     await db.pickups.update_one({"id": pickup_id}, {"$set": updates})
 
-    if req.status == "collected":
+    if req.status in LISTING_STATUS_FOR_PICKUP:
         await db.food_listings.update_one(
             {"id": pickup["listing_id"]},
-            {"$set": {"status": "picked_up"}}
-        )
-    elif req.status == "delivered":
-        await db.food_listings.update_one(
-            {"id": pickup["listing_id"]},
-            {"$set": {"status": "delivered"}}
+            {"$set": {"status": LISTING_STATUS_FOR_PICKUP[req.status], "updated_at": now}}
         )
 
     await db.audit_logs.insert_one({
@@ -163,13 +219,222 @@ async def update_pickup_status(
     return result
 
 
+@router.put("/bulk-status")
+async def bulk_update_pickup_status(
+    req: BulkUpdatePickupStatusRequest,
+    authorization: str = Header(None)
+):
+    user = await get_current_user(authorization)
+    if user["role"] not in ["ngo", "admin"]:
+        raise HTTPException(403, "Only NGOs can update pickups")
+    if not req.transitions:
+        raise HTTPException(400, "No transitions given")
+    if len(req.transitions) > MAX_BULK_TRANSITIONS:
+        raise HTTPException(400, f"At most {MAX_BULK_TRANSITIONS} transitions per request")
+
+    pickup_ids = list({t.pickup_id for t in req.transitions})
+    query = {"id": {"$in": pickup_ids}}
+    if user["role"] != "admin":
+        query["ngo_id"] = user["id"]
+    pickups = await db.pickups.find(query, {"_id": 0}).to_list(len(pickup_ids))
+    pickups_by_id = {p["id"]: p for p in pickups}
+    loaded_status = {p["id"]: p["status"] for p in pickups}
+
+    now = _bson_now()
+    pickup_updates = {}
+    listing_updates = {}
+    audit_entries = []
+    results = []
+
+    # validated in order, so one batch can move a pickup through several states
+    for t in req.transitions:
+        pickup = pickups_by_id.get(t.pickup_id)
+        if not pickup:
+            results.append({"pickup_id": t.pickup_id, "ok": False, "error": "Pickup not found"})
+            continue
+
+        current = pickup["status"]
+        if t.status not in VALID_TRANSITIONS.get(current, []):
+            results.append({
+                "pickup_id": t.pickup_id,
+                "ok": False,
+                "error": f"Cannot transition from {current} to {t.status}"
+            })
+            continue
+
+        pickup["status"] = t.status
+        updates = pickup_updates.setdefault(t.pickup_id, {})
+        updates["status"] = t.status
+        updates[f"timestamps.{t.status}"] = now
+        updates["updated_at"] = now
+        if t.notes:
+            updates["notes"] = t.notes
+
+        if t.status in LISTING_STATUS_FOR_PICKUP:
+            listing_updates[t.pickup_id] = (pickup["listing_id"], LISTING_STATUS_FOR_PICKUP[t.status])
+
+        audit_entries.append((t.pickup_id, {
+            "id": str(uuid.uuid4()),
+            "user_id": user["id"],
+            "user_email": user["email"],
+            "action": "update_pickup_status",
+            "details": f"Pickup {t.pickup_id} status: {current} -> {t.status}",
+            "timestamp": now
+        }))
+        results.append({"pickup_id": t.pickup_id, "ok": True, "from": current, "status": t.status})
+
+    lost = set()
+    if pickup_updates:
+        # only apply over the status the transitions were validated against
+        written = await db.pickups.bulk_write(
+            [UpdateOne({"id": pid, "status": loaded_status[pid]}, {"$set": updates})
+             for pid, updates in pickup_updates.items()],
+            ordered=False
+        )
+        if written.matched_count < len(pickup_updates):
+            lost = await _lost_updates(pickup_updates, now)
+        results = [
+            {"pickup_id": r["pickup_id"], "ok": False, "error": "Pickup changed concurrently"}
+            if r["ok"] and r["pickup_id"] in lost else r
+            for r in results
+        ]
+
+    listing_status = {lid: status for pid, (lid, status) in listing_updates.items() if pid not in lost}
+    if listing_status:
+        await db.food_listings.bulk_write(
+            [UpdateOne({"id": lid}, {"$set": {"status": status, "updated_at": now}})
+             for lid, status in listing_status.items()],
+            ordered=False
+        )
+    audit_entries = [entry for pid, entry in audit_entries if pid not in lost]
+    if audit_entries:
+        await db.audit_logs.insert_many(audit_entries, ordered=False)
+
+    applied_ids = [pid for pid in pickup_updates if pid not in lost]
+    updated = []
+    if applied_ids:
+        updated = await db.pickups.find(
+            {"id": {"$in": applied_ids}}, {"_id": 0}
+        ).to_list(len(applied_ids))
+
+    return {
+        "results": results,
+        "applied": sum(1 for r in results if r["ok"]),
+        "failed": sum(1 for r in results if not r["ok"]),
+        "pickups": updated
+    }
+
+
+def _bson_now():
+    # BSON dates keep milliseconds; truncate so the stored value compares equal
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+async def _lost_updates(pickup_updates, now):
+    """Pickups whose bulk update matched nothing because their status moved on.
+
+    A pickup this batch did update carries ``now`` as the timestamp of the
+    status it was moved to; the state machine never revisits a status, so a
+    later writer can't have overwritten it. A competing writer applying the
+    same transition within the same millisecond is indistinguishable.
+    """
+    pickups = await db.pickups.find(
+        {"id": {"$in": list(pickup_updates)}}, {"_id": 0, "id": 1, "timestamps": 1}
+    ).to_list(len(pickup_updates))
+    stamped = {
+        p["id"] for p in pickups
+        if (p.get("timestamps") or {}).get(pickup_updates[p["id"]]["status"]) == now
+    }
+    return set(pickup_updates) - stamped
+
+
+@router.post("/route-plan")
+async def plan_pickup_route(req: RoutePlanRequest, authorization: str = Header(None)):
+    """Order an NGO's pending/accepted pickups into a driving route from a depot."""
+    user = await get_current_user(authorization)
+    if user["role"] not in ["ngo", "admin"]:
+        raise HTTPException(403, "Only NGOs can plan pickup routes")
+    if req.avg_speed_kmh <= 0:
+        raise HTTPException(400, "Average speed must be greater than 0")
+    if req.service_minutes < 0:
+        raise HTTPException(400, "Service minutes cannot be negative")
+
+    ngo_id = user["id"]
+    if user["role"] == "admin":
+        if not req.ngo_id:
+            raise HTTPException(400, "ngo_id is required when an admin plans a route")
+        ngo_id = req.ngo_id
+
+    query = {"ngo_id": ngo_id, "status": {"$in": ["pending", "accepted"]}}
+    if req.pickup_ids:
+        query["id"] = {"$in": req.pickup_ids}
+    pickups = await db.pickups.find(query, {"_id": 0}).to_list(MAX_ROUTE_STOPS + 1)
+    if len(pickups) > MAX_ROUTE_STOPS:
+        raise HTTPException(400, f"At most {MAX_ROUTE_STOPS} stops per route")
+
+    listing_ids = [p["listing_id"] for p in pickups]
+    listings = await db.food_listings.find(
+        {"id": {"$in": listing_ids}},
+        {"_id": 0, "id": 1, "location": 1, "expiry_time": 1, "pickup_address": 1}
+    ).to_list(len(listing_ids))
+    listings_by_id = {l["id"]: l for l in listings}
+
+    stops = []
+    unlocated = []
+    for p in pickups:
+        listing = listings_by_id.get(p["listing_id"], {})
+        location = listing.get("location") or {}
+        if location.get("lat") is None or location.get("lng") is None:
+            unlocated.append(p["id"])
+            continue
+        stops.append({
+            "pickup_id": p["id"],
+            "listing_id": p["listing_id"],
+            "listing_name": p.get("listing_name", ""),
+            "donor_name": p.get("donor_name", ""),
+            "status": p["status"],
+            "pickup_address": listing.get("pickup_address", ""),
+            "lat": location["lat"],
+            "lng": location["lng"],
+            "expiry_time": listing.get("expiry_time"),
+            # stored as dates; only unconverted legacy strings can lack an offset
+            "deadline": parse_datetime(listing.get("expiry_time"), naive_tz=LEGACY_TIMEZONE),
+        })
+
+    now = datetime.now(timezone.utc)
+    route = await asyncio.to_thread(
+        plan_route,
+        {"lat": req.depot_lat, "lng": req.depot_lng},
+        stops,
+        speed_kmh=req.avg_speed_kmh,
+        service_min=req.service_minutes,
+        time_budget_s=ROUTE_TIME_BUDGET_S,
+        start_time=now.timestamp()
+    )
+    for stop in route["stops"]:
+        stop.pop("deadline")
+        stop["eta"] = now + timedelta(minutes=stop["eta_minutes"])
+
+    route["unlocated_pickups"] = unlocated
+    return route
+
+
 @router.post("/{pickup_id}/redistribution")
 async def create_redistribution(
     pickup_id: str,
     req: RedistributionRequest,
-    authorization: str = Header(None)
+    authorization: str = Header(None),
+    idempotency_key: Optional[str] = Header(None)
 ):
     user = await get_current_user(authorization)
+    return await idempotent(
+        idempotency_key, user, f"create_redistribution:{pickup_id}", req.model_dump(),
+        lambda: _create_redistribution(pickup_id, req, user)
+    )
+
+
+async def _create_redistribution(pickup_id: str, req: RedistributionRequest, user: dict):
     pickup = await db.pickups.find_one({"id": pickup_id}, {"_id": 0})
     if not pickup:
         raise HTTPException(404, "Pickup not found")
@@ -184,7 +449,7 @@ async def create_redistribution(
         "beneficiaries_count": req.beneficiaries_count,
         "portion_size": req.portion_size,
         "notes": req.notes,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": datetime.now(timezone.utc)
     }
     await db.redistribution.insert_one(redistribution)
 
@@ -0,0 +1,94 @@
+from fastapi import APIRouter, Header, HTTPException, Query
+from datetime import datetime, timezone
+from typing import Optional
+import asyncio
+from routes.auth import require_admin
+from routes.analytics import MEALS_PER_KG, CO2_PER_KG
+from snapshots import load_snapshot, run_snapshot
+
+router = APIRouter(prefix="/api/reports", tags=["reports"])
+
+
+def _impact(kg):
+    return {
+        "kg": round(float(kg), 1),
+        "meals": int(kg * MEALS_PER_KG),
+        "co2_avoided_kg": round(float(kg) * CO2_PER_KG, 1)
+    }
+
+
+def _grouped(df, by, label):
+    if df.empty:
+        return []
+    # groupby drops null keys; keep their quantity under "Unknown"
+    totals = df.groupby(df[by].fillna("Unknown"))["quantity"].sum().sort_values(ascending=False)
+    return [{label: key, **_impact(kg)} for key, kg in totals.items()]
+
+
+def compute_impact_report(month):
+    """Monthly impact aggregates computed from the Parquet snapshots."""
+    listings = load_snapshot(
+        "food_listings", month, ["donor_id", "donor_name", "category", "region", "quantity"]
+    )
+    pickups = load_snapshot("pickups", month, ["status", "listing_quantity"])
+    redistributions = load_snapshot("redistribution", month, ["ngo_id", "beneficiaries_count"])
+
+    delivered_kg = 0
+    if not pickups.empty:
+        delivered_kg = pickups.loc[pickups["status"] == "delivered", "listing_quantity"].sum()
+
+    by_donor = []
+    if not listings.empty:
+        donors = listings.groupby(listings["donor_id"].fillna("Unknown")).agg(
+            donor_name=("donor_name", "last"), quantity=("quantity", "sum")
+        ).sort_values("quantity", ascending=False)
+        donors["donor_name"] = donors["donor_name"].fillna("Unknown")
+        by_donor = [
+            {"donor_id": donor_id, "donor_name": row.donor_name, **_impact(row.quantity)}
+            for donor_id, row in donors.iterrows()
+        ]
+
+    beneficiaries_by_ngo = []
+    if not redistributions.empty:
+        totals = redistributions.groupby(redistributions["ngo_id"].fillna("Unknown"))["beneficiaries_count"].sum().sort_values(ascending=False)
+        beneficiaries_by_ngo = [
+            {"ngo_id": ngo_id, "beneficiaries": int(count)} for ngo_id, count in totals.items()
+        ]
+
+    return {
+        "month": month,
+        "totals": {
+            "listed": _impact(listings["quantity"].sum() if not listings.empty else 0),
+            "delivered": _impact(delivered_kg),
+            "listings": len(listings),
+            "pickups": len(pickups),
+            "beneficiaries": int(redistributions["beneficiaries_count"].sum()) if not redistributions.empty else 0
+        },
+        "by_category": _grouped(listings, "category", "category"),
+        "by_region": _grouped(listings, "region", "region"),
+        "by_donor": by_donor,
+        "beneficiaries_by_ngo": beneficiaries_by_ngo
+    }
+
+
+@router.post("/snapshots")
+async def refresh_snapshots(authorization: str = Header(None)):
+    await require_admin(authorization)
+    return await run_snapshot()
+
+
+@router.get("/impact")
+async def get_impact_report(
+    month: Optional[str] = Query(None),
+    authorization: str = Header(None)
+):
+    await require_admin(authorization)
+    if month:
+        try:
+            datetime.strptime(month, "%Y-%m")
+        except ValueError:
+            raise HTTPException(400, "month must be YYYY-MM")
+    else:
+        month = datetime.now(timezone.utc).strftime("%Y-%m")
+
+    return await asyncio.to_thread(compute_impact_report, month)
@@ -0,0 +1,141 @@
+"""Ordering a driver's pickup stops.
+
+Stops are ordered with a nearest-neighbour tour refined by 2-opt. Candidate
+tours are compared on (stops late, minutes late, distance), so deadlines are
+met where the geography allows and distance is minimised otherwise.
+"""
+import time
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_matrix(lats, lngs):
+    """Pairwise great-circle distances in km for the given coordinates."""
+    lat = np.radians(np.asarray(lats, dtype=float))
+    lng = np.radians(np.asarray(lngs, dtype=float))
+    dlat = lat[:, None] - lat[None, :]
+    dlng = lng[:, None] - lng[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _schedule(order, dist, deadlines, speed_kmh, service_min):
+    """Arrival minutes for each stop of ``order`` (index 0 is the depot)."""
+    path = np.concatenate(([0], order))
+    legs = dist[path[:-1], path[1:]]
+    travel = legs / speed_kmh * 60.0
+    arrivals = np.cumsum(travel) + service_min * np.arange(len(order))
+    lateness = np.maximum(arrivals - deadlines[order], 0.0)
+    return legs, arrivals, lateness
+
+
+def _cost(order, dist, deadlines, speed_kmh, service_min):
+    legs, _, lateness = _schedule(order, dist, deadlines, speed_kmh, service_min)
+    return (int(np.count_nonzero(lateness)), float(lateness.sum()), float(legs.sum()))
+
+
+def _nearest_neighbour(dist):
+    n = dist.shape[0]
+    unvisited = np.ones(n, dtype=bool)
+    unvisited[0] = False
+    order = []
+    current = 0
+    for _ in range(n - 1):
+        candidates = np.where(unvisited, dist[current], np.inf)
+        current = int(np.argmin(candidates))
+        unvisited[current] = False
+        order.append(current)
+    return np.array(order, dtype=int)
+
+
+def _two_opt(order, dist, deadlines, speed_kmh, service_min, deadline_at):
+    """Improve ``order`` by segment reversals until no gain or time runs out.
+
+    For each i the distance gain of every reversal (i, j) is computed at
+    once. Reversals that shorten the open tour are scored in full, and
+    longer ones only while some stop is still late.
+    """
+    best = _cost(order, dist, deadlines, speed_kmh, service_min)
+    n = len(order)
+    improved = True
+    while improved and time.monotonic() < deadline_at:
+        improved = False
+        path = np.concatenate(([0], order))
+        for i in range(1, n):
+            if time.monotonic() >= deadline_at:
+                break
+            a, b = path[i - 1], path[i]
+            js = np.arange(i + 1, n + 1)
+            c = path[js]
+            d = np.append(path[js[:-1] + 1], -1)
+            removed = dist[a, b] + np.where(d >= 0, dist[c, d.clip(0)], 0.0)
+            added = dist[a, c] + np.where(d >= 0, dist[b, d.clip(0)], 0.0)
+            gains = removed - added
+            for k in np.argsort(-gains):
+                # a longer tour can only win while some stop is still late
+                if gains[k] <= 1e-9 and best[1] == 0:
+                    break
+                j = js[k]
+                candidate = np.concatenate((order[:i - 1], order[i - 1:j][::-1], order[j:]))
+                cost = _cost(candidate, dist, deadlines, speed_kmh, service_min)
+                if cost < best:
+                    order, best, improved = candidate, cost, True
+                    path = np.concatenate(([0], order))
+                    break
+    return order
+
+
+def plan_route(depot, stops, speed_kmh=25.0, service_min=10.0, time_budget_s=1.0, start_time=None):
+    """Order ``stops`` starting from ``depot``.
+
+    ``depot`` is {"lat", "lng"}; each stop is a dict with "lat", "lng" and an
+    optional "deadline" (aware datetime). Returns the stops in visiting order,
+    each extended with leg/cumulative km, ETA and whether it arrives late.
+    """
+    if not stops:
+        return {"stops": [], "total_km": 0.0, "late_stops": 0}
+
+    start_time = start_time or time.time()
+    lats = [depot["lat"]] + [s["lat"] for s in stops]
+    lngs = [depot["lng"]] + [s["lng"] for s in stops]
+    dist = haversine_matrix(lats, lngs)
+
+    deadlines = np.full(len(stops) + 1, np.inf)
+    for idx, s in enumerate(stops, start=1):
+        if s.get("deadline") is not None:
+            deadlines[idx] = (s["deadline"].timestamp() - start_time) / 60.0
+
+    seeds = [_nearest_neighbour(dist)]
+    if np.isfinite(deadlines).any():
+        # earliest-deadline-first seed, undated stops last
+        seeds.append(np.argsort(deadlines[1:], kind="stable") + 1)
+
+    best_order, best_cost = None, None
+    for seed in seeds:
+        deadline_at = time.monotonic() + time_budget_s / len(seeds)
+        order = _two_opt(seed, dist, deadlines, speed_kmh, service_min, deadline_at)
+        cost = _cost(order, dist, deadlines, speed_kmh, service_min)
+        if best_cost is None or cost < best_cost:
+            best_order, best_cost = order, cost
+
+    legs, arrivals, lateness = _schedule(best_order, dist, deadlines, speed_kmh, service_min)
+    cumulative = np.cumsum(legs)
+    ordered = []
+    for pos, idx in enumerate(best_order):
+        stop = dict(stops[idx - 1])
+        stop.update({
+            "sequence": pos + 1,
+            "leg_km": round(float(legs[pos]), 2),
+            "cumulative_km": round(float(cumulative[pos]), 2),
+            "eta_minutes": round(float(arrivals[pos]), 1),
+            "late": bool(lateness[pos] > 0),
+        })
+        ordered.append(stop)
+
+    return {
+        "stops": ordered,
+        "total_km": round(float(cumulative[-1]), 2),
+        "late_stops": best_cost[0],
+    }
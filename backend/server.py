@@ -1,9 +1,15 @@
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import os
 import logging
 from database import db, client
+import profiling
+from indexes import ensure_indexes
+from sync import backfill_updated_at
+from dates import backfill_native_dates
+from migrations import run_once
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -27,7 +33,7 @@ async def seed_admin_user():
             "org_name": "Platform Admin",
             "service_area": "All",
             "phone": "",
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         })
         logger.info("Admin user seeded successfully")
     else:
@@ -36,13 +42,11 @@ async def seed_admin_user():
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    profiling.attach_loop(asyncio.get_running_loop())
     await seed_admin_user()
-    await db.users.create_index("email", unique=True)
-    await db.users.create_index("role")
-    await db.food_listings.create_index("donor_id")
-    await db.food_listings.create_index("status")
-    await db.pickups.create_index("listing_id")
-    await db.pickups.create_index("ngo_id")
+    await run_once("native_dates", backfill_native_dates)
+    await run_once("updated_at", backfill_updated_at)
+    await ensure_indexes(db)
     yield
     client.close()
 
@@ -55,6 +59,7 @@ from routes.pickups import router as pickups_router
 from routes.analytics import router as analytics_router
 from routes.evaluation import router as evaluation_router
 from routes.admin import router as admin_router
+from routes.reports import router as reports_router
 
 app.include_router(auth_router)
 app.include_router(listings_router)
@@ -62,6 +67,10 @@ app.include_router(pickups_router)
 app.include_router(analytics_router)
 app.include_router(evaluation_router)
 app.include_router(admin_router)
+app.include_router(reports_router)
+
+if profiling.PROFILE_DIR:
+    app.middleware("http")(profiling.profile_requests)
 
 app.add_middleware(
     CORSMiddleware,
@@ -0,0 +1,182 @@
+"""Columnar snapshots of listings, pickups and redistributions for reporting.
+
+Each collection is written as one Parquet file per creation day:
+
+    SNAPSHOT_DIR/<collection>/date=YYYY-MM-DD/part.parquet
+
+A run only rewrites the days that contain documents changed (or deleted)
+since the previous run, using the watermarks kept in manifest.json. Reports
+read these files instead of querying Mongo. Run with ``python snapshots.py``
+or through POST /api/reports/snapshots.
+"""
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from database import ROOT_DIR, db
+from dates import parse_datetime
+from sync import SYNC_LAG
+
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", str(ROOT_DIR / "snapshots"))
+CHUNK_SIZE = 1000
+
+# collection -> (field that moves on every change, columns kept)
+SNAPSHOT_COLLECTIONS = {
+    "food_listings": ("updated_at", [
+        "id", "donor_id", "donor_name", "category", "quantity", "status", "created_at"
+    ]),
+    "pickups": ("updated_at", [
+        "id", "listing_id", "ngo_id", "ngo_name", "status", "listing_quantity", "created_at"
+    ]),
+    "redistribution": ("created_at", [
+        "id", "pickup_id", "listing_id", "ngo_id", "beneficiaries_count", "portion_size", "created_at"
+    ]),
+}
+
+_run_lock = asyncio.Lock()
+
+
+def _manifest_path():
+    return os.path.join(SNAPSHOT_DIR, "manifest.json")
+
+
+def _load_manifest():
+    try:
+        with open(_manifest_path()) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"watermarks": {}}
+
+
+def _save_manifest(manifest):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    tmp = _manifest_path() + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, _manifest_path())
+
+
+def _partition_path(collection, day):
+    return os.path.join(SNAPSHOT_DIR, collection, f"date={day}", "part.parquet")
+
+
+def _day(value):
+    return value.strftime("%Y-%m-%d")
+
+
+async def _chunks(collection, query, projection):
+    cursor = db[collection].find(query, projection).batch_size(CHUNK_SIZE)
+    while True:
+        chunk = await cursor.to_list(CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def _dirty_days(collection, change_field, watermark, limit):
+    """Days holding documents changed or deleted after ``watermark``, up to ``limit``.
+
+    Changes newer than ``limit`` are left for the next run, so the returned
+    watermark never passes a write that was stamped but not yet committed.
+    """
+    days = set()
+    latest = watermark
+    changed = {"$lte": limit}
+    if watermark:
+        changed["$gt"] = watermark
+    query = {change_field: changed}
+    async for chunk in _chunks(collection, query, {"_id": 0, "created_at": 1, change_field: 1}):
+        for doc in chunk:
+            if isinstance(doc.get("created_at"), datetime):
+                days.add(_day(doc["created_at"]))
+            if doc.get(change_field) and (latest is None or doc[change_field] > latest):
+                latest = doc[change_field]
+
+    tombstone_query = {"collection": collection, "deleted_at": changed}
+    async for chunk in _chunks("tombstones", tombstone_query, {"_id": 0}):
+        for t in chunk:
+            if isinstance(t.get("created_at"), datetime):
+                days.add(_day(t["created_at"]))
+            if latest is None or t["deleted_at"] > latest:
+                latest = t["deleted_at"]
+    return days, latest
+
+
+async def _region_by_donor():
+    donors = await db.users.find(
+        {"role": "donor"}, {"_id": 0, "id": 1, "service_area": 1}
+    ).to_list(None)
+    return {d["id"]: d.get("service_area") or "Unknown" for d in donors}
+
+
+def _write_partition(collection, day, frames):
+    path = _partition_path(collection, day)
+    if not frames:
+        if os.path.exists(path):
+            os.remove(path)
+        return 0
+    df = pd.concat(frames, ignore_index=True)
+    df["created_at"] = pd.to_datetime(df["created_at"], utc=True)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    return len(df)
+
+
+async def _snapshot_day(collection, columns, day, regions):
+    start = datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    query = {"created_at": {"$gte": start, "$lt": start + timedelta(days=1)}}
+    projection = {"_id": 0, **{c: 1 for c in columns}}
+
+    frames = []
+    async for chunk in _chunks(collection, query, projection):
+        frame = pd.DataFrame.from_records(chunk, columns=columns)
+        if collection == "food_listings":
+            frame["region"] = frame["donor_id"].map(regions).fillna("Unknown")
+        frames.append(frame)
+    return await asyncio.to_thread(_write_partition, collection, day, frames)
+
+
+async def run_snapshot():
+    """Refresh the partitions touched since the last run; returns what was rewritten."""
+    async with _run_lock:
+        manifest = _load_manifest()
+        regions = await _region_by_donor()
+        summary = {}
+        # same lag as the delta sync reads, for the same late-commit race
+        limit = datetime.now(timezone.utc) - SYNC_LAG
+        for collection, (change_field, columns) in SNAPSHOT_COLLECTIONS.items():
+            watermark = parse_datetime(manifest["watermarks"].get(collection))
+            days, latest = await _dirty_days(collection, change_field, watermark, limit)
+            rows = 0
+            for day in sorted(days):
+                rows += await _snapshot_day(collection, columns, day, regions)
+            manifest["watermarks"][collection] = latest.isoformat() if latest else None
+            summary[collection] = {"partitions": len(days), "rows": rows}
+        manifest["last_run"] = datetime.now(timezone.utc).isoformat()
+        _save_manifest(manifest)
+        return summary
+
+
+def load_snapshot(collection, month, columns=None):
+    """All rows of ``collection`` created in ``month`` (YYYY-MM) as a DataFrame."""
+    base = os.path.join(SNAPSHOT_DIR, collection)
+    if not os.path.isdir(base):
+        return pd.DataFrame(columns=columns or [])
+    paths = [
+        os.path.join(base, d, "part.parquet")
+        for d in sorted(os.listdir(base))
+        if d.startswith(f"date={month}")
+    ]
+    frames = [pd.read_parquet(p, columns=columns) for p in paths if os.path.exists(p)]
+    if not frames:
+        return pd.DataFrame(columns=columns or [])
+    return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == "__main__":
+    print(json.dumps(asyncio.run(run_snapshot()), indent=2))
@@ -0,0 +1,104 @@
+"""Delta sync helpers for `since=` queries.
+
+Every mutating route stamps ``updated_at``; deletions leave a tombstone in
+``db.tombstones``. A sync read returns the documents changed after the
+client's watermark, the ids deleted after it, and the next watermark.
+
+Changes are ordered by (timestamp, id), and the watermark carries both as
+``<iso timestamp>|<id>`` so a page can end inside a group of documents
+written with the same timestamp (e.g. by the bulk status endpoint). A plain
+ISO timestamp is accepted as a starting point. Returned timestamps use the
+``Z`` suffix, so the watermark can go back into a query string as is; a
+``+00:00`` offset would need URL-encoding, as a raw ``+`` decodes to a space.
+"""
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from database import db
+from dates import parse_datetime
+
+SYNC_PAGE_SIZE = 500
+
+# Writes stamp their time before they commit, so reads stop this far behind
+# the clock; otherwise a write stamped before a read but committed after it
+# would fall behind the returned watermark and never be sent.
+SYNC_LAG = timedelta(seconds=5)
+
+
+def parse_watermark(since):
+    stamp, _, doc_id = since.partition("|")
+    parsed = parse_datetime(stamp)
+    if not parsed:
+        raise HTTPException(400, "since must be an ISO 8601 timestamp or a returned watermark")
+    return parsed, doc_id or None
+
+
+def format_watermark(stamp, doc_id):
+    iso = stamp.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+    return f"{iso}|{doc_id}" if doc_id else iso
+
+
+def after_cursor(field, stamp, doc_id, horizon):
+    """Filter for documents past (stamp, doc_id) and not newer than ``horizon``."""
+    newer = {field: {"$gt": stamp, "$lte": horizon}}
+    if not doc_id:
+        return newer
+    return {"$or": [newer, {field: stamp, "id": {"$gt": doc_id}}]}
+
+
+async def record_tombstone(collection, doc_id, deleted_at, created_at=None):
+    # created_at lets the reporting snapshots find the partition to rewrite
+    await db.tombstones.insert_one({
+        "collection": collection,
+        "id": doc_id,
+        "deleted_at": deleted_at,
+        "created_at": created_at
+    })
+
+
+async def changes_since(collection, scope, since, limit=SYNC_PAGE_SIZE):
+    """One page of changes to ``collection`` within ``scope`` after ``since``.
+
+    ``scope`` should only hold access restrictions (e.g. an NGO's own
+    pickups). Value filters such as status are left to the client, since a
+    document leaving a filter would otherwise never be reported. Tombstones
+    carry no scope fields, so every deleted id in the collection is returned;
+    clients drop the ones they never held.
+    """
+    stamp, doc_id = parse_watermark(since)
+    horizon = datetime.now(timezone.utc) - SYNC_LAG
+
+    items = await db[collection].find(
+        {**scope, **after_cursor("updated_at", stamp, doc_id, horizon)}, {"_id": 0}
+    ).sort([("updated_at", 1), ("id", 1)]).limit(limit).to_list(limit)
+    tombstones = await db.tombstones.find(
+        {"collection": collection, **after_cursor("deleted_at", stamp, doc_id, horizon)},
+        {"_id": 0}
+    ).sort([("deleted_at", 1), ("id", 1)]).limit(limit).to_list(limit)
+
+    # merge both streams on (timestamp, id) and cut at one page
+    changes = sorted(
+        [((i["updated_at"], i["id"]), i, False) for i in items]
+        + [((t["deleted_at"], t["id"]), t, True) for t in tombstones],
+        key=lambda change: change[0]
+    )
+    has_more = len(items) == limit or len(tombstones) == limit
+    if len(changes) > limit:
+        changes = changes[:limit]
+        has_more = True
+
+    watermark = format_watermark(*changes[-1][0]) if changes else since
+    return {
+        "items": [doc for _, doc, deleted in changes if not deleted],
+        "deleted": [doc["id"] for _, doc, deleted in changes if deleted],
+        "watermark": watermark,
+        "has_more": has_more
+    }
+
+
+async def backfill_updated_at():
+    """Give documents written before updated_at was maintained a starting value."""
+    for collection in ("food_listings", "pickups"):
+        await db[collection].update_many(
+            {"updated_at": {"$exists": False}},
+            [{"$set": {"updated_at": "$created_at"}}]
+        )
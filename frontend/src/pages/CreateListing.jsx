@@ -48,6 +48,8 @@ export default function CreateListing() {
     try {
       await api.post("/listings", {
         ...form,
+        // datetime-local has no zone; send the instant the user meant
+        expiry_time: new Date(form.expiry_time).toISOString(),
         quantity: Number(form.quantity),
         latitude: Number(form.latitude),
         longitude: Number(form.longitude),
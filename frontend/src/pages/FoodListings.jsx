@@ -177,7 +177,7 @@ useEffect(() => {
                   )}
                   <div className="flex items-center gap-1.5">
                     <Clock className="w-3.5 h-3.5 text-gray-400" />
-                    <span>Expires: {listing.expiry_time?.slice(0, 16).replace("T", " ")}</span>
+                    <span>Expires: {listing.expiry_time && new Date(listing.expiry_time).toLocaleString()}</span>
                   </div>
                   {listing.donor_name && user?.role !== "donor" && (
                     <p className="text-xs text-gray-400">By {listing.donor_name}</p>
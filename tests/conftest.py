@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# backend modules import each other as top-level modules (e.g. `from database import db`)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
@@ -0,0 +1,119 @@
+import asyncio
+import itertools
+
+import pytest
+
+from coalesce import single_flight, stats
+
+_names = itertools.count()
+
+
+def _counted(delay=0.02, key=None, ttl=0, error=None):
+    """A single_flight coroutine returning (arg, run number), plus its call log."""
+    runs = []
+
+    @single_flight(f"test.{next(_names)}", key=key, ttl=ttl)
+    async def compute(arg):
+        runs.append(arg)
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return arg, len(runs)
+
+    return compute, runs
+
+
+def test_concurrent_calls_with_one_key_run_once():
+    compute, runs = _counted(key=lambda arg: "same")
+
+    async def run():
+        return await asyncio.gather(*(compute("a") for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert results == [("a", 1)] * 5
+    assert runs == ["a"]
+
+
+def test_different_keys_do_not_share_results():
+    compute, runs = _counted(key=lambda arg: arg)
+
+    async def run():
+        return await asyncio.gather(compute("a"), compute("b"), compute("a"))
+
+    results = asyncio.run(run())
+    assert results[0] == results[2]
+    assert results[1][0] == "b"
+    assert sorted(runs) == ["a", "b"]
+
+
+def test_ttl_reuses_then_expires_the_result():
+    compute, runs = _counted(delay=0, key=lambda arg: arg, ttl=0.05)
+
+    async def run():
+        first = await compute("a")
+        cached = await compute("a")
+        await asyncio.sleep(0.1)
+        fresh = await compute("a")
+        return first, cached, fresh
+
+    first, cached, fresh = asyncio.run(run())
+    assert first == cached == ("a", 1)
+    assert fresh == ("a", 2)
+
+
+def test_without_ttl_finished_results_are_not_reused():
+    compute, runs = _counted(delay=0, key=lambda arg: arg)
+
+    async def run():
+        await compute("a")
+        await compute("a")
+
+    asyncio.run(run())
+    assert runs == ["a", "a"]
+
+
+def test_exceptions_reach_every_waiter_and_are_not_cached():
+    compute, runs = _counted(key=lambda arg: arg, ttl=60, error=ValueError("boom"))
+
+    async def run():
+        return await asyncio.gather(compute("a"), compute("a"), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert runs == ["a"]
+
+    with pytest.raises(ValueError):
+        asyncio.run(compute("a"))
+    assert runs == ["a", "a"]
+
+
+def test_one_caller_cancelling_does_not_cancel_the_others():
+    compute, runs = _counted(delay=0.05, key=lambda arg: arg)
+
+    async def run():
+        leaving = asyncio.ensure_future(compute("a"))
+        staying = asyncio.ensure_future(compute("a"))
+        await asyncio.sleep(0.01)
+        leaving.cancel()
+        return await staying, leaving
+
+    result, leaving = asyncio.run(run())
+    assert result == ("a", 1)
+    assert leaving.cancelled()
+    assert runs == ["a"]
+
+
+def test_counters_track_executions_and_coalesced_calls():
+    name = f"test.{next(_names)}"
+
+    @single_flight(name, key=lambda: "k", ttl=60)
+    async def compute():
+        await asyncio.sleep(0.02)
+        return 1
+
+    async def run():
+        await asyncio.gather(compute(), compute())
+        await compute()
+
+    asyncio.run(run())
+    assert stats[name] == {"calls": 3, "executions": 1, "coalesced": 1, "cache_hits": 1}
@@ -0,0 +1,36 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from dates import LEGACY_TIMEZONE, date_range, parse_datetime
+
+
+def _utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_date_only_to_covers_the_whole_day():
+    assert date_range("2024-06-01", "2024-06-30") == {
+        "$gte": _utc(2024, 6, 1),
+        "$lt": _utc(2024, 7, 1),
+    }
+
+
+def test_timestamp_to_is_inclusive():
+    assert date_range(None, "2024-06-30T12:00:00Z") == {"$lte": _utc(2024, 6, 30, 12)}
+
+
+def test_unreadable_bound_is_a_400():
+    with pytest.raises(HTTPException) as exc:
+        date_range("last week", None)
+    assert exc.value.status_code == 400
+
+
+def test_offsets_are_normalised_to_utc():
+    assert parse_datetime("2024-06-30T18:00:00+05:30") == _utc(2024, 6, 30, 12, 30)
+
+
+def test_naive_values_can_be_rejected_or_read_in_a_zone():
+    assert parse_datetime("2024-06-30T18:00", naive_tz=None) is None
+    assert parse_datetime("2024-06-30T18:00", naive_tz=LEGACY_TIMEZONE) == _utc(2024, 6, 30, 12, 30)
@@ -0,0 +1,157 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+import idempotency
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+USER = {"id": "u1"}
+RECORD_ID = "u1:create:k1"
+
+
+@pytest.fixture
+def db(monkeypatch):
+    mock = mongomock_motor.AsyncMongoMockClient(tz_aware=True)["idempotency_test"]
+    monkeypatch.setattr(idempotency, "db", mock)
+    monkeypatch.setattr(idempotency, "_cache", idempotency.OrderedDict())
+    monkeypatch.setattr(idempotency, "_inflight", {})
+    monkeypatch.setattr(idempotency, "WAIT_TIMEOUT_S", 0.5)
+    monkeypatch.setattr(idempotency, "POLL_INTERVAL_S", 0.01)
+    return mock
+
+
+class Handler:
+    """Counts calls; optionally slow or failing."""
+
+    def __init__(self, delay=0.0, error=None):
+        self.calls = 0
+        self.delay = delay
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return {"id": "r1", "call": self.calls}
+
+
+def _call(fn, body=None, key="k1"):
+    return idempotency.idempotent(key, USER, "create", body or {"a": 1}, fn)
+
+
+def _pending(fingerprint, locked_until, owner="other"):
+    return {
+        "_id": RECORD_ID,
+        "fingerprint": fingerprint,
+        "status": "pending",
+        "owner": owner,
+        "locked_until": locked_until,
+        "created_at": datetime.now(timezone.utc),
+    }
+
+
+def test_replays_the_stored_response(db):
+    fn = Handler()
+
+    async def run():
+        first = await _call(fn)
+        second = await _call(fn)
+        idempotency._cache.clear()
+        third = await _call(fn)
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert first == second == third == {"id": "r1", "call": 1}
+    assert fn.calls == 1
+
+
+def test_without_a_key_always_runs(db):
+    fn = Handler()
+
+    async def run():
+        await _call(fn, key=None)
+        await _call(fn, key=None)
+
+    asyncio.run(run())
+    assert fn.calls == 2
+
+
+def test_reused_key_with_another_body_is_a_422(db):
+    fn = Handler()
+
+    async def run():
+        await _call(fn, {"a": 1})
+        await _call(fn, {"a": 2})
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(run())
+    assert exc.value.status_code == 422
+
+
+def test_concurrent_duplicates_in_one_process_share_one_run(db):
+    fn = Handler(delay=0.05)
+
+    async def run():
+        return await asyncio.gather(_call(fn), _call(fn), _call(fn))
+
+    results = asyncio.run(run())
+    assert results == [{"id": "r1", "call": 1}] * 3
+    assert fn.calls == 1
+
+
+def test_failure_deletes_the_record_so_the_key_can_be_retried(db):
+    failing = Handler(error=ValueError("boom"))
+
+    with pytest.raises(ValueError):
+        asyncio.run(_call(failing))
+    assert asyncio.run(db.idempotency_keys.find_one({"_id": RECORD_ID})) is None
+
+    fn = Handler()
+    assert asyncio.run(_call(fn)) == {"id": "r1", "call": 1}
+
+
+def test_expired_lease_is_taken_over(db):
+    fingerprint = idempotency._fingerprint({"a": 1})
+    stale = datetime.now(timezone.utc) - timedelta(seconds=1)
+    asyncio.run(db.idempotency_keys.insert_one(_pending(fingerprint, stale)))
+    fn = Handler()
+
+    assert asyncio.run(_call(fn)) == {"id": "r1", "call": 1}
+    record = asyncio.run(db.idempotency_keys.find_one({"_id": RECORD_ID}))
+    assert record["status"] == "completed"
+    assert record["owner"] != "other"
+
+
+def test_live_lease_makes_a_duplicate_wait_then_409(db):
+    fingerprint = idempotency._fingerprint({"a": 1})
+    live = datetime.now(timezone.utc) + timedelta(seconds=30)
+    asyncio.run(db.idempotency_keys.insert_one(_pending(fingerprint, live)))
+    fn = Handler()
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(_call(fn))
+    assert exc.value.status_code == 409
+    assert fn.calls == 0
+
+
+def test_running_request_renews_its_lease(db, monkeypatch):
+    monkeypatch.setattr(idempotency, "LEASE_S", 0.15)
+    monkeypatch.setattr(idempotency, "WAIT_TIMEOUT_S", 2)
+    fingerprint = idempotency._fingerprint({"a": 1})
+    slow = Handler(delay=0.5)
+    duplicate = Handler()
+
+    async def run():
+        first = asyncio.ensure_future(idempotency._execute(RECORD_ID, fingerprint, slow))
+        await asyncio.sleep(0.3)
+        # another process: bypasses the in-process task and polls the record
+        second = await idempotency._execute(RECORD_ID, fingerprint, duplicate)
+        return await first, second
+
+    first, second = asyncio.run(run())
+    assert first == second == {"id": "r1", "call": 1}
+    assert duplicate.calls == 0
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from indexes import catalogue_indexes, ensure_indexes
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+def _index_keys(db, collection):
+    info = asyncio.run(db[collection].index_information())
+    return {name: [tuple(k) for k in spec["key"]] for name, spec in info.items()}
+
+
+def test_ensure_indexes_drops_indexes_outside_the_catalogue():
+    db = mongomock_motor.AsyncMongoMockClient()["indexes_test"]
+
+    async def legacy():
+        # the single-field indexes the server used to create at startup
+        await db.food_listings.create_index("donor_id")
+        await db.food_listings.create_index("status")
+        await db.pickups.create_index("listing_id")
+        await db.pickups.create_index("ngo_id")
+        await db.unrelated.create_index("x")
+
+    asyncio.run(legacy())
+    asyncio.run(ensure_indexes(db))
+
+    for collection in ("food_listings", "pickups"):
+        names = _index_keys(db, collection)
+        assert not {"donor_id_1", "status_1", "listing_id_1", "ngo_id_1"} & set(names)
+    assert "x_1" in _index_keys(db, "unrelated")
+
+    declared = {}
+    for collection, keys, _ in catalogue_indexes():
+        declared.setdefault(collection, []).append(keys)
+    for collection, keys_list in declared.items():
+        existing = list(_index_keys(db, collection).values())
+        for keys in keys_list:
+            assert keys in existing
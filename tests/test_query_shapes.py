@@ -0,0 +1,67 @@
+"""Every catalogued query shape must be served by an index, without an
+in-memory sort. Needs a reachable mongod (MONGO_URL); skipped otherwise."""
+import os
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from indexes import QUERY_SHAPES, catalogue_indexes
+from profiling import summarize_explain
+
+SAMPLE_DATE = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+def _sample_value(value):
+    if isinstance(value, dict) and "$in" in value:
+        return value["$in"][0]
+    if isinstance(value, dict):
+        return SAMPLE_DATE
+    return value
+
+
+def _seed(db):
+    """One document per shape, so every collection exists and every index has keys."""
+    for shape in QUERY_SHAPES:
+        doc = {k: _sample_value(v) for k, v in shape["filter"].items() if not k.startswith("$")}
+        for field, _ in shape["index"] + shape.get("sort", []):
+            doc.setdefault(field, SAMPLE_DATE)
+        doc["id"] = str(uuid.uuid4())
+        if shape["collection"] == "users":
+            doc["email"] = f"{doc['id']}@example.com"
+        db[shape["collection"]].insert_one(doc)
+
+
+@pytest.fixture(scope="module")
+def seeded_db():
+    client = MongoClient(
+        os.environ.get("MONGO_URL", "mongodb://localhost:27017"),
+        serverSelectionTimeoutMS=1000, tz_aware=True
+    )
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip("no mongod reachable at MONGO_URL")
+
+    name = "{}_query_shapes_{}".format(os.environ.get("DB_NAME", "test_database"), uuid.uuid4().hex[:8])
+    client.drop_database(name)
+    db = client[name]
+    for collection, keys, options in catalogue_indexes():
+        db[collection].create_index(keys, **options)
+    _seed(db)
+    yield db
+    client.drop_database(name)
+    client.close()
+
+
+@pytest.mark.parametrize("shape", QUERY_SHAPES, ids=[s["name"] for s in QUERY_SHAPES])
+def test_query_shape_uses_index(seeded_db, shape):
+    cursor = seeded_db[shape["collection"]].find(shape["filter"])
+    if shape.get("sort"):
+        cursor = cursor.sort(shape["sort"])
+    summary = summarize_explain(cursor.explain())
+
+    assert not summary["collscan"], f"{shape['name']} scans the collection: {summary['stages']}"
+    assert not summary["in_memory_sort"], f"{shape['name']} sorts in memory: {summary['stages']}"
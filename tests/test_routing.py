@@ -0,0 +1,62 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from routing import _cost, _two_opt, haversine_matrix, plan_route
+
+
+def test_haversine_matrix_known_distance():
+    # Delhi -> Mumbai is roughly 1150 km great-circle
+    dist = haversine_matrix([28.6139, 19.0760], [77.2090, 72.8777])
+    assert dist.shape == (2, 2)
+    assert abs(dist[0, 1] - 1150) < 10
+
+
+def test_haversine_matrix_is_symmetric_with_zero_diagonal():
+    dist = haversine_matrix([28.5, 28.6, 28.7], [77.0, 77.1, 77.3])
+    assert np.allclose(dist, dist.T)
+    assert np.allclose(np.diag(dist), 0.0)
+
+
+def test_two_opt_uncrosses_a_tour():
+    # depot then four stops along a line, visited out of order
+    lats = [0.0, 0.0, 0.0, 0.0, 0.0]
+    lngs = [0.0, 0.1, 0.2, 0.3, 0.4]
+    dist = haversine_matrix(lats, lngs)
+    deadlines = np.full(5, np.inf)
+    order = np.array([1, 3, 2, 4])
+
+    improved = _two_opt(order, dist, deadlines, 25.0, 0.0, time.monotonic() + 1.0)
+
+    assert sorted(improved.tolist()) == [1, 2, 3, 4]
+    assert improved.tolist() == [1, 2, 3, 4]
+    assert _cost(improved, dist, deadlines, 25.0, 0.0) < _cost(order, dist, deadlines, 25.0, 0.0)
+
+
+def test_cost_ranks_lateness_before_distance():
+    # stop 1 lies behind the depot, stop 2 far ahead with a 4 minute deadline
+    dist = haversine_matrix([0.0, 0.0, 0.0], [0.0, -0.1, 0.5])
+    deadlines = np.array([np.inf, np.inf, 4.0])
+    short_but_late = np.array([1, 2])
+    long_but_on_time = np.array([2, 1])
+    late = _cost(short_but_late, dist, deadlines, 1000.0, 0.0)
+    on_time = _cost(long_but_on_time, dist, deadlines, 1000.0, 0.0)
+    assert late[0] == 1 and on_time[0] == 0
+    assert on_time[2] > late[2]
+    assert on_time < late
+
+
+def test_plan_route_visits_urgent_stop_first():
+    now = datetime.now(timezone.utc)
+    stops = [
+        {"id": "near", "lat": 0.0, "lng": 0.01},
+        {"id": "urgent", "lat": 0.0, "lng": 0.05, "deadline": now + timedelta(minutes=20)},
+    ]
+    route = plan_route({"lat": 0.0, "lng": 0.0}, stops, service_min=15.0, start_time=now.timestamp())
+    assert [s["id"] for s in route["stops"]] == ["urgent", "near"]
+    assert route["late_stops"] == 0
+
+
+def test_plan_route_without_stops_has_same_shape():
+    assert plan_route({"lat": 0.0, "lng": 0.0}, []) == {"stops": [], "total_km": 0.0, "late_stops": 0}
@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+import sync
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+T0 = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    mock = mongomock_motor.AsyncMongoMockClient(tz_aware=True)["sync_test"]
+    monkeypatch.setattr(sync, "db", mock)
+    return mock
+
+
+def _changes(since, limit):
+    return asyncio.run(sync.changes_since("pickups", {}, since, limit=limit))
+
+
+def _insert(db, collection, docs):
+    asyncio.run(db[collection].insert_many(docs))
+
+
+def _drain(since, limit):
+    pages = []
+    while True:
+        page = _changes(since, limit)
+        pages.append(page)
+        since = page["watermark"]
+        if not page["has_more"]:
+            return pages
+
+
+def test_pages_through_documents_sharing_a_timestamp(db):
+    ids = [f"p{i}" for i in range(5)]
+    _insert(db, "pickups", [{"id": i, "updated_at": T0} for i in reversed(ids)])
+
+    pages = _drain("2024-01-01T00:00:00Z", limit=2)
+
+    seen = [item["id"] for page in pages for item in page["items"]]
+    assert seen == ids
+    assert [len(page["items"]) for page in pages[:3]] == [2, 2, 1]
+    assert pages[0]["watermark"] == "2024-06-01T00:00:00Z|p1"
+
+
+def test_tombstone_lands_inside_a_page(db):
+    _insert(db, "pickups", [
+        {"id": "a", "updated_at": T0},
+        {"id": "c", "updated_at": T0 + timedelta(seconds=2)},
+    ])
+    asyncio.run(sync.record_tombstone("pickups", "b", T0 + timedelta(seconds=1)))
+
+    page = _changes("2024-01-01T00:00:00Z", limit=3)
+    assert [item["id"] for item in page["items"]] == ["a", "c"]
+    assert page["deleted"] == ["b"]
+    assert page["watermark"] == "2024-06-01T00:00:02Z|c"
+
+    first = _changes("2024-01-01T00:00:00Z", limit=2)
+    assert [item["id"] for item in first["items"]] == ["a"]
+    assert first["deleted"] == ["b"]
+    assert first["has_more"]
+    rest = _changes(first["watermark"], limit=2)
+    assert [item["id"] for item in rest["items"]] == ["c"]
+    assert rest["deleted"] == []
+
+
+def test_tombstones_from_other_collections_are_ignored(db):
+    asyncio.run(sync.record_tombstone("food_listings", "l1", T0))
+
+    assert _changes("2024-01-01T00:00:00Z", limit=10)["deleted"] == []
+
+
+def test_has_more_when_items_fill_the_page(db):
+    _insert(db, "pickups", [{"id": "a", "updated_at": T0}, {"id": "b", "updated_at": T0}])
+
+    assert _changes("2024-01-01T00:00:00Z", limit=2)["has_more"]
+    assert not _changes("2024-01-01T00:00:00Z", limit=3)["has_more"]
+
+
+def test_has_more_when_tombstones_fill_the_page(db):
+    asyncio.run(sync.record_tombstone("pickups", "a", T0))
+    asyncio.run(sync.record_tombstone("pickups", "b", T0))
+
+    page = _changes("2024-01-01T00:00:00Z", limit=2)
+    assert page["deleted"] == ["a", "b"]
+    assert page["has_more"]
+
+
+def test_recent_writes_wait_for_the_sync_lag(db):
+    _insert(db, "pickups", [
+        {"id": "old", "updated_at": T0},
+        {"id": "new", "updated_at": datetime.now(timezone.utc)},
+    ])
+
+    page = _changes("2024-01-01T00:00:00Z", limit=10)
+    assert [item["id"] for item in page["items"]] == ["old"]
+
+
+def test_unchanged_watermark_is_returned_as_given(db):
+    page = _changes("2024-01-01T00:00:00Z|x", limit=10)
+    assert page == {"items": [], "deleted": [], "watermark": "2024-01-01T00:00:00Z|x", "has_more": False}
+
+
+def test_watermark_round_trips_without_a_plus_sign():
+    watermark = sync.format_watermark(T0, "p1")
+    assert "+" not in watermark
+    assert sync.parse_watermark(watermark) == (T0, "p1")
+
+
+@pytest.mark.parametrize("since", ["yesterday", "|p1", "2024-13-01T00:00:00Z|p1"])
+def test_bad_since_is_a_400(db, since):
+    with pytest.raises(HTTPException) as exc:
+        _changes(since, limit=10)
+    assert exc.value.status_code == 400